@@ -11,85 +11,336 @@ How to get your Canvas API Token:
 How to get your ntfy topic:
   1. Install the free "ntfy" app on your iPhone from the App Store
   2. Tap + and subscribe to a unique topic name e.g. "phoenix123-canvas-8472"
+
+Set VERIFY_GRAPHQL=1 to cross-check the batched GraphQL fetch against the
+per-course REST endpoints; any difference is printed and REST is used instead.
 """
 
+import gzip
+import orjson
 import requests
-import json
 import os
-from datetime import datetime
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 CANVAS_URL            = os.environ["CANVAS_URL"].strip()
 CANVAS_API_TOKEN      = os.environ["CANVAS_API_TOKEN"].strip()
 NTFY_TOPIC            = os.environ["NTFY_TOPIC"].strip()
-SEEN_GRADES_FILE      = "seen_grades.json"
-SEEN_ASSIGNMENTS_FILE = "seen_assignments.json"
-
-
-def get_headers():
-    return {"Authorization": f"Bearer {CANVAS_API_TOKEN}"}
+SEEN_GRADES_FILE      = "seen_grades.jsonl"
+SEEN_ASSIGNMENTS_FILE = "seen_assignments.jsonl"
+HTTP_CACHE_FILE       = "http_cache.json.gz"
+REQUEST_TIMEOUT       = 30
+MAX_WORKERS           = 8
+NOTIFY_WORKERS        = 4
+RATE_LIMIT_BUCKET     = 700.0  # Canvas's default per-token throttle budget
+RATE_LIMIT_RETRIES    = 3
+RATE_LIMIT_MAX_WAIT   = 60.0
+
+
+def make_session():
+    # One pooled keep-alive session per host, so each run pays the TLS handshake once
+    # instead of once per request. Transient errors and 429s are retried with backoff.
+    session = requests.Session()
+    retries = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        raise_on_status=False,
+    )
+    session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retries))
+    return session
+
+
+def retry_after_seconds(value, default):
+    # Retry-After is either delta-seconds or an HTTP-date; anything unparseable
+    # falls back to the default, and the wait is capped so a run can't stall.
+    seconds = default
+    if value:
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                pass
+    return min(max(0.0, seconds), RATE_LIMIT_MAX_WAIT)
+
+
+def throttle(response, *args, **kwargs):
+    # Canvas reports the remaining throttle budget on every API response. Back
+    # off proportionally once it drops below half, and when it has run out
+    # (Canvas answers 403 "Rate Limit Exceeded", which Retry can't tell apart
+    # from a real 403) wait and resend.
+    attempt = 0
+    while (
+        response.status_code == 403
+        and b"Rate Limit Exceeded" in response.content
+        and attempt < RATE_LIMIT_RETRIES
+    ):
+        time.sleep(retry_after_seconds(response.headers.get("Retry-After"), 2 ** attempt))
+        request = response.request.copy()
+        request.hooks = {"response": []}
+        response = SESSION.send(request, timeout=kwargs.get("timeout"))
+        attempt += 1
+
+    remaining = response.headers.get("X-Rate-Limit-Remaining")
+    if remaining is not None:
+        time.sleep(max(0.0, 1 - float(remaining) / (RATE_LIMIT_BUCKET / 2)) * 0.5)
+    return response
+
+
+SESSION = make_session()
+SESSION.headers.update({"Authorization": f"Bearer {CANVAS_API_TOKEN}"})
+SESSION.hooks["response"].append(throttle)
+NTFY_SESSION = make_session()
+
+# url -> {"etag", "last_modified", "next", "body"}; persisted between runs so
+# unchanged pages come back as an empty 304 instead of the full payload.
+HTTP_CACHE = {}
+
+# url -> (body, next_url, changed) for pages already fetched during this run.
+RUN_CACHE = {}
+
+# Shared by both checkers so concurrent runs of them cap total Canvas fan-out
+# at MAX_WORKERS instead of each spinning up its own pool.
+FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+# (title, message, priority, future) items drained by the notify workers.
+NOTIFY_QUEUE = queue.Queue()
+
+
+def write_atomic(filepath, data):
+    # Write to a temp file and rename over the target, so a runner that dies
+    # mid-write leaves the previous file intact instead of a truncated one.
+    tmp = filepath + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filepath)
 
 
 def load_json(filepath):
-    if os.path.exists(filepath):
-        with open(filepath, "r") as f:
-            return json.load(f)
-    return {}
+    # A missing or corrupt cache just means starting cold, never a failed run.
+    try:
+        with open(filepath, "rb") as f:
+            return orjson.loads(gzip.decompress(f.read()))
+    except (FileNotFoundError, gzip.BadGzipFile, EOFError, orjson.JSONDecodeError):
+        return {}
 
 
 def save_json(filepath, data):
-    with open(filepath, "w") as f:
-        json.dump(data, f, indent=2)
+    # mtime=0 keeps the gzip header stable, so identical data gives identical
+    # bytes and the workflow doesn't commit a new blob every run.
+    write_atomic(filepath, gzip.compress(orjson.dumps(data), mtime=0))
 
 
-def send_notification(title, message, priority="default"):
+# Seen state is an append-only log of {"key": [course_id, item_id], "value": ...}
+# lines, replayed last-write-wins on load, so a run only writes the entries that
+# changed. Keys are (int, int) tuples in memory.
+def append_event(filepath, key, value):
+    with open(filepath, "ab") as f:
+        f.write(orjson.dumps({"key": key, "value": value}) + b"\n")
+
+
+def compact_if_needed(filepath, seen, line_count):
+    if line_count <= 2 * len(seen):
+        return
+    write_atomic(filepath, b"".join(
+        orjson.dumps({"key": key, "value": value}) + b"\n" for key, value in seen.items()
+    ))
+
+
+def load_state(filepath):
+    seen = {}
+    line_count = 0
     try:
-        response = requests.post(
+        f = open(filepath, "rb")
+    except FileNotFoundError:
+        return seen
+    with f:
+        good_bytes = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            good_bytes += len(line)
+            if line.strip():
+                event = orjson.loads(line)
+                seen[tuple(event["key"])] = event["value"]
+                line_count += 1
+        if good_bytes < f.seek(0, os.SEEK_END):
+            # Drop a torn final append from an interrupted run before appending after it.
+            os.truncate(filepath, good_bytes)
+    compact_if_needed(filepath, seen, line_count)
+    return seen
+
+
+def post_notification(title, message, priority):
+    # Returns (delivered, error). Runs on a notify worker, so it doesn't print;
+    # the checker logs the outcome in order.
+    try:
+        response = NTFY_SESSION.post(
             f"https://ntfy.sh/{NTFY_TOPIC}",
             data=message.encode("utf-8"),
             headers={
                 "Title": title,
                 "Priority": priority,
                 "Tags": "mortar_board",
-            }
+            },
+            timeout=REQUEST_TIMEOUT,
         )
-        return response.status_code == 200
+        return response.status_code == 200, None
     except Exception as e:
-        print(f"  Notification error: {e}")
-        return False
+        return False, e
+
+
+def notify_worker():
+    while True:
+        title, message, priority, future = NOTIFY_QUEUE.get()
+        try:
+            future.set_result(post_notification(title, message, priority))
+        finally:
+            NOTIFY_QUEUE.task_done()
+
+
+def start_notify_workers():
+    for _ in range(NOTIFY_WORKERS):
+        threading.Thread(target=notify_worker, daemon=True).start()
 
 
+def send_notification(title, message, priority="default"):
+    # Queues the POST and returns a Future that resolves to (delivered, error).
+    future = Future()
+    NOTIFY_QUEUE.put((title, message, priority, future))
+    return future
+
+
+@lru_cache(maxsize=4096)
 def format_due_date(due_at_str):
     if not due_at_str:
         return "No due date"
     try:
-        dt = datetime.strptime(due_at_str, "%Y-%m-%dT%H:%M:%SZ")
+        dt = datetime.fromisoformat(due_at_str.replace("Z", "+00:00"))
         return dt.strftime("%a %b %-d at %-I:%M %p") + " UTC"
-    except Exception:
+    except ValueError:
         return due_at_str
 
 
-def get_active_courses():
-    url = f"{CANVAS_URL}/api/v1/courses"
-    params = {"enrollment_state": "active", "per_page": 50}
-    response = requests.get(url, headers=get_headers(), params=params)
+def prepare_url(url, params=None):
+    return requests.Request("GET", url, params=params).prepare().url
+
+
+def conditional_get(url, params=None, trim=None, keep_body=True, revalidate=True):
+    # Returns (body, next_url, changed), revalidating against the cached copy if
+    # there is one; changed is False when Canvas answered 304 Not Modified.
+    # trim() is applied to each item before it is cached or handed back.
+    # With keep_body=False only the validators are persisted, so a 304 comes back
+    # with body None; revalidate=False refetches such a page unconditionally.
+    url = prepare_url(url, params)
+    if url in RUN_CACHE and (revalidate or RUN_CACHE[url][0] is not None):
+        return RUN_CACHE[url]
+    cached = HTTP_CACHE.get(url) if revalidate else None
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    response = SESSION.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    if response.status_code == 304 and cached:
+        if not keep_body:
+            cached.pop("body", None)
+        RUN_CACHE[url] = cached.get("body"), cached["next"], False
+        return RUN_CACHE[url]
     response.raise_for_status()
-    return response.json()
+
+    body     = orjson.loads(response.content)
+    if trim:
+        body = [trim(item) for item in body]
+    next_url = response.links.get("next", {}).get("url")
+    etag     = response.headers.get("ETag")
+    modified = response.headers.get("Last-Modified")
+    if etag or modified:
+        HTTP_CACHE[url] = {"etag": etag, "last_modified": modified, "next": next_url}
+        if keep_body:
+            HTTP_CACHE[url]["body"] = body
+    else:
+        HTTP_CACHE.pop(url, None)
+    RUN_CACHE[url] = body, next_url, True
+    return RUN_CACHE[url]
+
+
+def paginate(url, params, trim=None, keep_body=True, revalidate=True):
+    # Canvas caps every list endpoint at per_page items and links to the rest
+    # through the Link header, so follow rel="next" until it runs out.
+    page, next_url, _ = conditional_get(url, params, trim, keep_body, revalidate)
+    yield from page or ()
+    while next_url:
+        page, next_url, _ = conditional_get(next_url, None, trim, keep_body, revalidate)
+        yield from page or ()
+
+
+def pages_unchanged(url, params):
+    # True if every page of a list already fetched this run came back 304.
+    url = prepare_url(url, params)
+    while url:
+        if url not in RUN_CACHE or RUN_CACHE[url][2]:
+            return False
+        # Stored next links are raw Link-header URLs; RUN_CACHE keys are prepared.
+        next_url = RUN_CACHE[url][1]
+        url = prepare_url(next_url) if next_url else None
+    return True
+
+
+# Canvas REST has no field selection, so keep only what the checkers read.
+# Missing keys stay missing, so the callers' .get() defaults still apply.
+def pick(d, *keys):
+    return {key: d[key] for key in keys if key in d}
+
+
+def trim_course(course):
+    trimmed = pick(course, "id", "name")
+    trimmed["enrollments"] = [
+        pick(e, "type", "computed_current_score", "computed_current_grade")
+        for e in course.get("enrollments") or []
+    ]
+    return trimmed
+
+
+def trim_submission(submission):
+    trimmed = pick(submission, "id", "user_id", "score", "grade")
+    trimmed["assignment"] = pick(submission.get("assignment") or {}, "name", "points_possible")
+    trimmed["submission_comments"] = [
+        dict(pick(c, "comment"), author=pick(c.get("author") or {}, "id", "display_name"))
+        for c in submission.get("submission_comments") or []
+    ]
+    return trimmed
+
+
+def trim_assignment(assignment):
+    return pick(assignment, "id", "name", "due_at", "points_possible")
 
 
-def get_course_grade(course_id):
-    url = f"{CANVAS_URL}/api/v1/courses/{course_id}/enrollments"
-    params = {"type[]": "StudentEnrollment", "state[]": "active", "user_id": "self"}
-    response = requests.get(url, headers=get_headers(), params=params)
-    if response.status_code != 200:
-        return None, None
-    enrollments = response.json()
-    if not enrollments:
-        return None, None
-    grades = enrollments[0].get("grades", {})
-    return grades.get("current_score"), grades.get("current_grade")
+def get_active_courses():
+    url = f"{CANVAS_URL}/api/v1/courses"
+    params = {"enrollment_state": "active", "per_page": 50, "include[]": ["total_scores"]}
+    return list(paginate(url, params, trim_course))
 
 
-def get_graded_submissions(course_id):
+def get_graded_submissions(course_id, skip_unchanged=True):
+    # Returns (submissions, unchanged); unchanged means Canvas reported every page
+    # as identical to what the last completed run already diffed, in which case
+    # the list is empty unless skip_unchanged=False. Submission pages carry
+    # instructor comments, so only their validators are persisted: a page that
+    # 304s while others changed is fetched again in full.
     url = f"{CANVAS_URL}/api/v1/courses/{course_id}/students/submissions"
     params = {
         "student_ids[]": "self",
@@ -97,39 +348,190 @@ def get_graded_submissions(course_id):
         "include[]": ["assignment", "submission_comments"],
         "per_page": 50,
     }
-    response = requests.get(url, headers=get_headers(), params=params)
-    if response.status_code == 401:
-        raise Exception("Invalid Canvas API token.")
-    if response.status_code != 200:
-        return []
-    return response.json()
+    try:
+        list(paginate(url, params, trim_submission, keep_body=False))
+        unchanged = pages_unchanged(url, params)
+        if unchanged and skip_unchanged:
+            return [], True
+        return list(paginate(url, params, trim_submission, keep_body=False, revalidate=False)), unchanged
+    except requests.HTTPError as e:
+        if e.response.status_code == 401:
+            raise Exception("Invalid Canvas API token.")
+        return [], False
 
 
 def get_assignments(course_id):
     url = f"{CANVAS_URL}/api/v1/courses/{course_id}/assignments"
     params = {"per_page": 50, "order_by": "due_at"}
-    response = requests.get(url, headers=get_headers(), params=params)
-    if response.status_code != 200:
+    try:
+        return list(paginate(url, params, trim_assignment))
+    except requests.HTTPError:
         return []
-    return response.json()
 
 
-def check_for_new_grades(courses):
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Checking for new grades...")
-    seen = load_json(SEEN_GRADES_FILE)
-    found = 0
+COURSE_DATA_QUERY = """
+  c%(id)s: course(id: "%(id)s") {
+    submissionsConnection(first: 100, filter: {states: [graded]}) {
+      pageInfo { hasNextPage }
+      nodes {
+        _id score grade
+        user { _id }
+        assignment { _id name pointsPossible }
+        commentsConnection(first: 100, filter: {allComments: true}) {
+          pageInfo { hasNextPage }
+          nodes { comment author { _id shortName } }
+        }
+      }
+    }
+    assignmentsConnection(first: 100, filter: {gradingPeriodId: null}) {
+      pageInfo { hasNextPage }
+      nodes { _id name dueAt pointsPossible }
+    }
+  }"""
+
+
+def to_utc_timestamp(iso_str):
+    # GraphQL returns times in the user's zone; REST (and the seen state) uses UTC "Z" strings.
+    if not iso_str:
+        return None
+    return datetime.fromisoformat(iso_str).astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
+
+def fetch_everything_graphql(courses):
+    # One POST for every course's graded submissions and assignments, reshaped to
+    # match the REST payloads. Raises on transport or query errors so the caller
+    # can fall back to REST; a course (or just its submissions or assignments)
+    # that came back missing or truncated is left out, and fetched over REST.
+    query = "query {" + "".join(COURSE_DATA_QUERY % {"id": int(c["id"])} for c in courses) + "\n}"
+    response = SESSION.post(f"{CANVAS_URL}/api/graphql", json={"query": query}, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    payload = orjson.loads(response.content)
+    del response  # release the raw body before building the reshaped copy
+    if payload.get("errors"):
+        raise Exception(payload["errors"][0].get("message", "GraphQL error"))
+
+    # Pop each course's subtree as it is converted, so the raw tree and the
+    # reshaped one are never both fully resident.
+    data = payload["data"]
+    prefetched = {}
+    for course in courses:
+        node = data.pop(f"c{int(course['id'])}", None)
+        if node is None:
+            continue
+        submissions = node["submissionsConnection"]
+        assignments = node["assignmentsConnection"]
+        complete = prefetched[course["id"]] = {}
+
+        if not (
+            submissions["pageInfo"]["hasNextPage"]
+            or any(sub["commentsConnection"]["pageInfo"]["hasNextPage"] for sub in submissions["nodes"])
+        ):
+            complete["submissions"] = [
+                {
+                    "id": int(sub["_id"]),
+                    "user_id": (sub.get("user") or {}).get("_id"),
+                    "score": sub.get("score"),
+                    "grade": sub.get("grade"),
+                    "assignment": {
+                        "name": sub["assignment"]["name"],
+                        "points_possible": sub["assignment"].get("pointsPossible"),
+                    },
+                    "submission_comments": [
+                        {
+                            "comment": c.get("comment") or "",
+                            "author": {
+                                "id": (c.get("author") or {}).get("_id"),
+                                "display_name": (c.get("author") or {}).get("shortName", "?"),
+                            },
+                        }
+                        for c in sub["commentsConnection"]["nodes"]
+                    ],
+                }
+                for sub in submissions["nodes"]
+            ]
+
+        if not assignments["pageInfo"]["hasNextPage"]:
+            complete["assignments"] = [
+                {
+                    "id": int(a["_id"]),
+                    "name": a["name"],
+                    "due_at": to_utc_timestamp(a.get("dueAt")),
+                    "points_possible": a.get("pointsPossible"),
+                }
+                for a in assignments["nodes"]
+            ]
+    return prefetched
+
+
+def graphql_mismatches(courses, prefetched):
+    # Opt-in check (VERIFY_GRAPHQL=1): refetch every course over REST and list
+    # the submission/assignment ids that only one of the two paths returned.
+    mismatches = []
     for course in courses:
-        course_id   = str(course.get("id"))
+        course_id = course.get("id")
+        complete  = prefetched.get(course_id, {})
+        rest = {}
+        if "submissions" in complete:
+            rest["submissions"] = get_graded_submissions(course_id, skip_unchanged=False)[0]
+        if "assignments" in complete:
+            rest["assignments"] = get_assignments(course_id)
+        for kind, rest_items in rest.items():
+            graphql_ids = {item["id"] for item in prefetched[course_id][kind]}
+            rest_ids    = {item["id"] for item in rest_items}
+            if graphql_ids != rest_ids:
+                mismatches.append(
+                    f"  {course.get('name') or course_id} {kind}: "
+                    f"GraphQL only {sorted(graphql_ids - rest_ids)}, REST only {sorted(rest_ids - graphql_ids)}"
+                )
+    return mismatches
+
+
+def fetch_grade_data(course, prefetched):
+    # Runs on a worker thread: network only, no shared state.
+    course_id = course.get("id")
+    if "submissions" in prefetched.get(course_id, {}):
+        return None, prefetched[course_id]["submissions"], False
+    try:
+        return None, *get_graded_submissions(course_id)
+    except Exception as e:
+        return e, None, False
+
+
+def fetch_assignment_data(course, prefetched):
+    course_id = course.get("id")
+    if "assignments" in prefetched.get(course_id, {}):
+        return prefetched[course_id]["assignments"]
+    return get_assignments(course_id)
+
+
+def get_course_grade(course):
+    # Filled in by include[]=total_scores on the courses request.
+    enrollments = course.get("enrollments") or [{}]
+    enrollment = next((e for e in enrollments if e.get("type") == "student"), enrollments[0])
+    return enrollment.get("computed_current_score"), enrollment.get("computed_current_grade")
+
+
+def check_for_new_grades(courses, prefetched):
+    now     = datetime.now()
+    now_iso = now.isoformat()  # one run timestamp for every entry recorded below
+    log     = [f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] Checking for new grades..."]
+    seen = load_state(SEEN_GRADES_FILE)
+    found = 0
+    pending = []
+
+    results = list(FETCH_EXECUTOR.map(lambda course: fetch_grade_data(course, prefetched), courses))
+
+    for course, (error, submissions, unchanged) in zip(courses, results):
+        course_id   = course.get("id")
         course_name = course.get("name", "Unknown Course")
 
-        try:
-            submissions = get_graded_submissions(course_id)
-        except Exception as e:
-            print(f"  Skipping {course_name}: {e}")
+        if error is not None:
+            log.append(f"  Skipping {course_name}: {error}")
+            continue
+        if unchanged:
             continue
 
-        course_score, course_grade = get_course_grade(course_id)
+        course_score, course_grade = get_course_grade(course)
         if course_score is not None and course_grade:
             overall_str = f"{course_score}% ({course_grade})"
         elif course_score is not None:
@@ -140,26 +542,36 @@ def check_for_new_grades(courses):
             overall_str = "N/A"
 
         for submission in submissions:
-            submission_id   = str(submission.get("id"))
+            submission_id   = submission.get("id")
             assignment      = submission.get("assignment", {})
             assignment_name = assignment.get("name", "Unknown Assignment")
             score           = submission.get("score")
             points_possible = assignment.get("points_possible")
             grade           = submission.get("grade", "N/A")
-            key             = f"{course_id}_{submission_id}"
-
-            raw_comments = submission.get("submission_comments", [])
-            comment_lines = [
-                f"{c['author']['display_name']}: {c['comment'].strip()}"
-                for c in raw_comments
-                if c.get("comment", "").strip()
-                and c.get("author", {}).get("id") != submission.get("user_id")
-            ]
+            key             = (course_id, submission_id)
 
+            raw_comments         = submission.get("submission_comments", [])
             stored               = seen.get(key)
             stored_comment_count = stored.get("comment_count", 0) if stored else 0
-            is_new_grade         = key not in seen
-            has_new_comments     = len(comment_lines) > stored_comment_count
+
+            # Already notified and no more comments than were counted then (the
+            # stored count is of filtered comments, so raw <= stored means none new).
+            if stored is not None and len(raw_comments) <= stored_comment_count:
+                continue
+
+            user_id       = submission.get("user_id")
+            comment_lines = []
+            for c in raw_comments:
+                text = (c.get("comment") or "").strip()
+                if not text:
+                    continue
+                author = c.get("author") or {}
+                if author.get("id") == user_id:
+                    continue
+                comment_lines.append(f"{author.get('display_name', '?')}: {text}")
+
+            is_new_grade     = stored is None
+            has_new_comments = len(comment_lines) > stored_comment_count
 
             if is_new_grade or has_new_comments:
                 seen[key] = {
@@ -167,8 +579,9 @@ def check_for_new_grades(courses):
                     "course": course_name,
                     "grade": grade,
                     "comment_count": len(comment_lines),
-                    "notified_at": datetime.now().isoformat(),
+                    "notified_at": now_iso,
                 }
+                append_event(SEEN_GRADES_FILE, key, seen[key])
 
                 score_str = f"{score}/{points_possible} ({grade})" if score is not None and points_possible else str(grade)
 
@@ -181,33 +594,44 @@ def check_for_new_grades(courses):
                     message_parts.append("Instructor comments:")
                     message_parts.extend(f"  {line}" for line in comment_lines)
 
-                if send_notification(
+                pending.append((send_notification(
                     title=f"Grade Posted: {course_name}",
                     message=f"{assignment_name}\n" + "\n".join(message_parts),
                     priority="high"
-                ):
-                    print(f"  Notified: [{course_name}] {assignment_name} -> {score_str}")
-                    found += 1
+                ), f"  Notified: [{course_name}] {assignment_name} -> {score_str}"))
 
-    save_json(SEEN_GRADES_FILE, seen)
-    print(f"  -> {found} new grade(s) found." if found else "  -> No new grades.")
+    for future, log_line in pending:
+        delivered, error = future.result()
+        if delivered:
+            log.append(log_line)
+            found += 1
+        elif error is not None:
+            log.append(f"  Notification error: {error}")
 
+    log.append(f"  -> {found} new grade(s) found." if found else "  -> No new grades.")
+    return log
 
-def check_for_new_assignments(courses):
-    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Checking for new/updated assignments...")
-    seen = load_json(SEEN_ASSIGNMENTS_FILE)
+
+def check_for_new_assignments(courses, prefetched):
+    now     = datetime.now()
+    now_iso = now.isoformat()  # one run timestamp for every entry recorded below
+    log     = [f"[{now.strftime('%Y-%m-%d %H:%M:%S')}] Checking for new/updated assignments..."]
+    seen = load_state(SEEN_ASSIGNMENTS_FILE)
     found = 0
+    pending = []
 
-    for course in courses:
-        course_id   = str(course.get("id"))
+    results = list(FETCH_EXECUTOR.map(lambda course: fetch_assignment_data(course, prefetched), courses))
+
+    for course, assignments in zip(courses, results):
+        course_id   = course.get("id")
         course_name = course.get("name", "Unknown Course")
 
-        for assignment in get_assignments(course_id):
-            assignment_id   = str(assignment.get("id"))
+        for assignment in assignments:
+            assignment_id   = assignment.get("id")
             assignment_name = assignment.get("name", "Unknown Assignment")
             due_at          = assignment.get("due_at")
             points_possible = assignment.get("points_possible")
-            key             = f"{course_id}_{assignment_id}"
+            key             = (course_id, assignment_id)
             due_str         = format_due_date(due_at)
             points_str      = f"{int(points_possible)} pts" if points_possible else "ungraded"
 
@@ -216,33 +640,39 @@ def check_for_new_assignments(courses):
                     "name": assignment_name,
                     "course": course_name,
                     "due_at": due_at,
-                    "first_seen": datetime.now().isoformat(),
+                    "first_seen": now_iso,
                 }
-                if send_notification(
+                append_event(SEEN_ASSIGNMENTS_FILE, key, seen[key])
+                pending.append((send_notification(
                     title=f"New Assignment: {course_name}",
                     message=f"{assignment_name}\nDue: {due_str}\nWorth: {points_str}",
                     priority="default"
-                ):
-                    print(f"  New assignment: [{course_name}] {assignment_name}")
-                    found += 1
+                ), f"  New assignment: [{course_name}] {assignment_name}"))
 
             else:
                 stored_due = seen[key].get("due_at")
                 if due_at != stored_due:
                     old_due_str                 = format_due_date(stored_due)
                     seen[key]["due_at"]         = due_at
-                    seen[key]["due_changed_at"] = datetime.now().isoformat()
+                    seen[key]["due_changed_at"] = now_iso
+                    append_event(SEEN_ASSIGNMENTS_FILE, key, seen[key])
 
-                    if send_notification(
+                    pending.append((send_notification(
                         title=f"Deadline Changed: {course_name}",
                         message=f"{assignment_name}\nOld due: {old_due_str}\nNew due: {due_str}",
                         priority="high"
-                    ):
-                        print(f"  Deadline changed: [{course_name}] {assignment_name}")
-                        found += 1
+                    ), f"  Deadline changed: [{course_name}] {assignment_name}"))
+
+    for future, log_line in pending:
+        delivered, error = future.result()
+        if delivered:
+            log.append(log_line)
+            found += 1
+        elif error is not None:
+            log.append(f"  Notification error: {error}")
 
-    save_json(SEEN_ASSIGNMENTS_FILE, seen)
-    print(f"  -> {found} assignment notification(s) sent." if found else "  -> No new assignments or changes.")
+    log.append(f"  -> {found} assignment notification(s) sent." if found else "  -> No new assignments or changes.")
+    return log
 
 
 if __name__ == "__main__":
@@ -250,12 +680,35 @@ if __name__ == "__main__":
     print("  Canvas Grade Notifier")
     print("=" * 55)
 
+    start_notify_workers()
+    HTTP_CACHE.update(load_json(HTTP_CACHE_FILE))
     try:
         courses = get_active_courses()
     except Exception as e:
         print(f"Could not fetch Canvas courses: {e}")
         exit(1)
 
-    check_for_new_grades(courses)
-    check_for_new_assignments(courses)
+    try:
+        prefetched = fetch_everything_graphql(courses) if courses else {}
+    except Exception as e:
+        print(f"GraphQL batch unavailable, using REST: {e}")
+        prefetched = {}
+
+    if prefetched and os.environ.get("VERIFY_GRAPHQL"):
+        mismatches = graphql_mismatches(courses, prefetched)
+        if mismatches:
+            print("GraphQL and REST disagree, using REST:\n" + "\n".join(mismatches))
+            prefetched = {}
+
+    # The checkers touch disjoint state files, so run them side by side; each
+    # returns its log lines so the output stays in order.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        grades      = executor.submit(check_for_new_grades, courses, prefetched)
+        assignments = executor.submit(check_for_new_assignments, courses, prefetched)
+        print("\n".join(grades.result()))
+        print("\n".join(assignments.result()))
+    NOTIFY_QUEUE.join()
+    # Only keep pages this run actually used, so courses and page URLs that have
+    # dropped out of the account don't linger in the committed cache forever.
+    save_json(HTTP_CACHE_FILE, {url: entry for url, entry in HTTP_CACHE.items() if url in RUN_CACHE})
     print("\nDone.")